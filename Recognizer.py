@@ -15,8 +15,12 @@ class Recognizer(object):
     """
     def __init__(self, sample_rate = 10):
         self.sample_rate = sample_rate
-        self.training_x = pickle.load(open('data/exemplary_trainX.p','rb'))
-        self.training_y = pickle.load(open('data/exemplary_trainY.p','rb'))
+        # The exemplary-point pickles were written by Python 2; latin1
+        # maps its str bytes onto the numpy payload losslessly
+        self.training_x = pickle.load(open('data/exemplary_trainX.p','rb'),
+                                      encoding='latin1')
+        self.training_y = pickle.load(open('data/exemplary_trainY.p','rb'),
+                                      encoding='latin1')
         self.m = dtw.KnnDtw()
         self.m.fit(self.training_x, self.training_y)
                 
@@ -0,0 +1,169 @@
+/* C implementation of the banded DTW dynamic program.
+ *
+ * Mirrors the jitted kernel in knn_dtw_class.py: float32 input series
+ * of shape [n_timepoints, n_features], squared-Euclidean pointwise
+ * cost taken in float32 and accumulated in double (the same arithmetic
+ * as the jitted kernel), the first row and column always filled,
+ * interior cells restricted to the warping band, and early abandoning
+ * against an upper bound. Built via setup.py; knn_dtw_class falls back
+ * to the Numba kernel when the extension is absent.
+ */
+#define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
+#include <Python.h>
+#include <numpy/arrayobject.h>
+#include <math.h>
+#include <stdlib.h>
+
+static double
+dtw_run(const float *pa, const float *pb,
+        npy_intp M, npy_intp N, npy_intp D, long w, double ub)
+{
+    double *prev, *curr, *tmp, res;
+    npy_intp i, j, k, j_lo, j_hi;
+    double c, best, row_min;
+    float diff;
+
+    prev = malloc((size_t)N * sizeof(double));
+    curr = malloc((size_t)N * sizeof(double));
+    if (prev == NULL || curr == NULL) {
+        free(prev);
+        free(curr);
+        return -1.0;
+    }
+
+    /* First row: cumulative cost, ignoring the band like the original */
+    c = 0.0;
+    for (k = 0; k < D; k++) {
+        diff = pa[k] - pb[k];
+        c += (double)(diff * diff);
+    }
+    prev[0] = c;
+    for (j = 1; j < N; j++) {
+        c = 0.0;
+        for (k = 0; k < D; k++) {
+            diff = pa[k] - pb[j * D + k];
+            c += (double)(diff * diff);
+        }
+        prev[j] = prev[j - 1] + c;
+    }
+
+    for (i = 1; i < M; i++) {
+        for (j = 0; j < N; j++)
+            curr[j] = INFINITY;
+
+        c = 0.0;
+        for (k = 0; k < D; k++) {
+            diff = pa[i * D + k] - pb[k];
+            c += (double)(diff * diff);
+        }
+        curr[0] = prev[0] + c;
+        row_min = curr[0];
+
+        j_lo = i - w > 1 ? i - w : 1;
+        j_hi = i + w < N ? i + w : N;
+        for (j = j_lo; j < j_hi; j++) {
+            c = 0.0;
+            for (k = 0; k < D; k++) {
+                diff = pa[i * D + k] - pb[j * D + k];
+                c += (double)(diff * diff);
+            }
+            best = prev[j - 1];
+            if (curr[j - 1] < best)
+                best = curr[j - 1];
+            if (prev[j] < best)
+                best = prev[j];
+            curr[j] = best + c;
+            if (curr[j] < row_min)
+                row_min = curr[j];
+        }
+
+        if (row_min >= ub) {
+            free(prev);
+            free(curr);
+            return INFINITY;
+        }
+
+        tmp = prev;
+        prev = curr;
+        curr = tmp;
+    }
+
+    res = prev[N - 1];
+    free(prev);
+    free(curr);
+    return res;
+}
+
+static PyObject *
+dtw(PyObject *self, PyObject *args)
+{
+    PyObject *a_obj, *b_obj;
+    PyArrayObject *a, *b;
+    int w;
+    double ub, res;
+    npy_intp M, N, D;
+
+    if (!PyArg_ParseTuple(args, "OOid", &a_obj, &b_obj, &w, &ub))
+        return NULL;
+
+    a = (PyArrayObject *)PyArray_FROM_OTF(a_obj, NPY_FLOAT32,
+                                          NPY_ARRAY_IN_ARRAY);
+    b = (PyArrayObject *)PyArray_FROM_OTF(b_obj, NPY_FLOAT32,
+                                          NPY_ARRAY_IN_ARRAY);
+    if (a == NULL || b == NULL) {
+        Py_XDECREF(a);
+        Py_XDECREF(b);
+        return NULL;
+    }
+    if (PyArray_NDIM(a) != 2 || PyArray_NDIM(b) != 2 ||
+            PyArray_DIM(a, 1) != PyArray_DIM(b, 1)) {
+        PyErr_SetString(PyExc_ValueError,
+                        "expected 2-D series with matching feature counts");
+        Py_DECREF(a);
+        Py_DECREF(b);
+        return NULL;
+    }
+
+    M = PyArray_DIM(a, 0);
+    N = PyArray_DIM(b, 0);
+    D = PyArray_DIM(a, 1);
+    if (M == 0 || N == 0) {
+        Py_DECREF(a);
+        Py_DECREF(b);
+        return PyFloat_FromDouble(INFINITY);
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    res = dtw_run((const float *)PyArray_DATA(a),
+                  (const float *)PyArray_DATA(b), M, N, D, w, ub);
+    Py_END_ALLOW_THREADS
+
+    Py_DECREF(a);
+    Py_DECREF(b);
+    if (res == -1.0) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+    return PyFloat_FromDouble(res);
+}
+
+static PyMethodDef dtw_ext_methods[] = {
+    {"dtw", dtw, METH_VARARGS,
+     "dtw(ts_a, ts_b, max_warping_window, upper_bound) -> float\n\n"
+     "Banded DTW distance between two float32 [n_timepoints, n_features]\n"
+     "series with squared-Euclidean pointwise cost; returns inf once the\n"
+     "distance is known to reach upper_bound."},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef dtw_ext_module = {
+    PyModuleDef_HEAD_INIT, "_dtw_ext",
+    "C kernel for the banded DTW dynamic program.", -1, dtw_ext_methods
+};
+
+PyMODINIT_FUNC
+PyInit__dtw_ext(void)
+{
+    import_array();
+    return PyModule_Create(&dtw_ext_module);
+}
@@ -1,11 +1,315 @@
 # Code from https://github.com/markdregan/K-Nearest-Neighbors-with-Dynamic-Time-Warping
 
-import sys
 import collections
+import heapq
 import itertools
 from sklearn import metrics
-from scipy.stats import mode
+from scipy.spatial.distance import cdist, squareform
 import numpy as np
+from joblib import Parallel, delayed
+from numba import cuda, float64, njit, prange
+
+# Optional C implementation of the DP (see _dtw_ext.c / setup.py);
+# without it the Numba kernel below does the same work
+try:
+    import _dtw_ext
+except ImportError:
+    _dtw_ext = None
+
+
+def _as_series(ts):
+    """Coerce a timeseries to a contiguous 2-D float32 array so the
+    jitted kernel compiles for a single signature.
+
+    float32 halves the kernel's memory traffic and is ample for sensor
+    traces scaled to [-1, 1]; the DP itself still accumulates in
+    float64."""
+    ts = np.ascontiguousarray(ts, dtype=np.float32)
+    if ts.ndim == 1:
+        ts = ts.reshape(-1, 1)
+    return ts
+
+
+def _series_list(x):
+    """Wrap a collection of timeseries in a 1-D object array.
+
+    The series in this dataset have different lengths, which numpy
+    no longer stacks implicitly, so the container is always an object
+    array of individual series."""
+    out = np.empty(len(x), dtype=object)
+    for i in range(len(x)):
+        out[i] = np.asarray(x[i])
+    return out
+
+
+# fastmath is restricted to the flags that keep inf well-defined: the
+# buffers and the early-abandon return value rely on inf comparisons.
+_FASTMATH_FLAGS = {'contract', 'arcp', 'afn', 'reassoc'}
+
+
+@njit(cache=True, fastmath=_FASTMATH_FLAGS)
+def _dtw_nb(ts_a, ts_b, w, ub):
+    """Jitted DTW dynamic program over two 2-D series.
+
+    The pointwise cost is the squared Euclidean distance between
+    samples, inlined so each DP cell is a handful of machine ops
+    instead of a Python-level distance call. The inputs are float32
+    (see _as_series); the buffers and running sums are float64, so only
+    the pointwise differences see the reduced precision.
+
+    The sweep runs over anti-diagonals i + j = s rather than rows: the
+    cells of one diagonal have no dependencies on each other, only on
+    the two previous diagonals, so the inner loop is free of the
+    loop-carried chain a row sweep has and only three length-M buffers
+    are live (O(min(M, N)) working cells per step).
+
+    Cell (i, j) is computed when it lies on the first row or column or
+    within the warping band -w <= j - i <= w - 1, mirroring the
+    original row DP exactly; reads check the same predicate so cells
+    the original never filled stay at inf.
+
+    ub is an upper bound for early abandoning: a warping path advances
+    s by 1 or 2 per step, so it visits at least one of any two
+    consecutive diagonals, and cell costs are non-negative. Once two
+    consecutive diagonal minima reach ub the final distance is known to
+    be at least ub and the sweep stops, returning inf. Pass np.inf to
+    always run to completion.
+    """
+    M, N = ts_a.shape[0], ts_b.shape[0]
+    D = ts_a.shape[1]
+
+    # If the band excludes the final cell the distance is inf no matter
+    # what, just as the row DP would leave cost[-1, -1] unfilled
+    if M > 1 and N > 1:
+        off = (N - 1) - (M - 1)
+        if off < -w or off > w - 1:
+            return np.inf
+
+    d2 = np.full(M, np.inf)  # diagonal s - 2, indexed by row
+    d1 = np.full(M, np.inf)  # diagonal s - 1
+    d0 = np.full(M, np.inf)  # diagonal s
+    prev_min = np.inf
+
+    for s in range(M + N - 1):
+        if s > 0:
+            d2, d1, d0 = d1, d0, d2
+
+        # Rows of this diagonal inside the grid, tightened to the band
+        # once the first-row / first-column cells have run out
+        lo = max(0, s - (N - 1))
+        hi = min(s, M - 1)
+        if s > N - 1:
+            lo = max(lo, (s - w + 2) // 2)
+        if s > M - 1:
+            hi = min(hi, (s + w) // 2)
+
+        diag_min = np.inf
+        for i in range(lo, hi + 1):
+            j = s - i
+            if i > 0 and j > 0:
+                off = j - i
+                if off < -w or off > w - 1:
+                    continue
+
+            c = 0.0
+            for k in range(D):
+                diff = ts_a[i, k] - ts_b[j, k]
+                c += diff * diff
+
+            if i == 0 and j == 0:
+                val = c
+            elif i == 0:
+                val = d1[0] + c
+            elif j == 0:
+                val = d1[i - 1] + c
+            else:
+                # The diagonal predecessor shares this cell's band
+                # offset, so it is always filled; the left and top
+                # neighbors sit one band slot over and may not be
+                best = d2[i - 1]
+                if (j == 1 or j - i > -w) and d1[i] < best:
+                    best = d1[i]
+                if (i == 1 or j - i < w - 1) and d1[i - 1] < best:
+                    best = d1[i - 1]
+                val = best + c
+
+            d0[i] = val
+            if val < diag_min:
+                diag_min = val
+
+        if diag_min >= ub and prev_min >= ub:
+            return np.inf
+        prev_min = diag_min
+
+    return d0[M - 1]
+
+
+def _dtw_dispatch(ts_a, ts_b, w, ub):
+    """Run the DP in the C extension when built, else in the jitted
+    kernel; both take _as_series arrays and agree on semantics."""
+    if _dtw_ext is not None:
+        return _dtw_ext.dtw(ts_a, ts_b, w, ub)
+    return _dtw_nb(ts_a, ts_b, w, ub)
+
+
+@njit(cache=True, parallel=True, fastmath=_FASTMATH_FLAGS)
+def _dtw_pairs_nb(xs, idx_i, idx_j, w):
+    """Condensed pairwise DTW distances over a stacked set of series.
+
+    xs has shape [n_series, n_timepoints, n_features]; idx_i/idx_j
+    enumerate the upper-triangle pairs, one prange iteration each, so
+    the pairs are spread evenly over the cores without the pickling
+    overhead of a process pool.
+    """
+    n_pairs = idx_i.shape[0]
+    out = np.empty(n_pairs)
+    for p in prange(n_pairs):
+        out[p] = _dtw_nb(xs[idx_i[p]], xs[idx_j[p]], w, np.inf)
+    return out
+
+
+# Longest subsampled series the CUDA kernel accepts: thread-local
+# buffers must be sized at compile time
+_CUDA_MAX_LEN = 256
+
+
+@cuda.jit
+def _dtw_pairs_cuda(xa, xb, w, out):
+    """CUDA kernel: one thread per (i, j) pair of the distance matrix.
+
+    Each thread runs the same banded DP as the CPU kernels over its
+    pair, with the two DP rows in thread-local memory. The sets are
+    modest (tens of short series), so a thread per pair keeps the
+    kernel trivial while saturating the device.
+    """
+    p = cuda.grid(1)
+    n_a = xa.shape[0]
+    n_b = xb.shape[0]
+    if p >= n_a * n_b:
+        return
+    ia = p // n_b
+    ib = p % n_b
+    M = xa.shape[1]
+    N = xb.shape[1]
+    D = xa.shape[2]
+
+    buf = cuda.local.array((2, _CUDA_MAX_LEN), float64)
+
+    # First row: cumulative cost, ignoring the band like the CPU DP
+    c = 0.0
+    for k in range(D):
+        diff = xa[ia, 0, k] - xb[ib, 0, k]
+        c += diff * diff
+    buf[0, 0] = c
+    for j in range(1, N):
+        c = 0.0
+        for k in range(D):
+            diff = xa[ia, 0, k] - xb[ib, j, k]
+            c += diff * diff
+        buf[0, j] = buf[0, j - 1] + c
+
+    prv = 0
+    for i in range(1, M):
+        cur = i & 1
+        prv = 1 - cur
+        for j in range(N):
+            buf[cur, j] = np.inf
+
+        c = 0.0
+        for k in range(D):
+            diff = xa[ia, i, k] - xb[ib, 0, k]
+            c += diff * diff
+        buf[cur, 0] = buf[prv, 0] + c
+
+        for j in range(max(1, i - w), min(N, i + w)):
+            c = 0.0
+            for k in range(D):
+                diff = xa[ia, i, k] - xb[ib, j, k]
+                c += diff * diff
+            best = buf[prv, j - 1]
+            if buf[cur, j - 1] < best:
+                best = buf[cur, j - 1]
+            if buf[prv, j] < best:
+                best = buf[prv, j]
+            buf[cur, j] = best + c
+
+    out[ia, ib] = buf[(M - 1) & 1, N - 1]
+
+
+@njit(cache=True, fastmath=_FASTMATH_FLAGS)
+def _keogh_envelope_nb(ts_c, w):
+    """Per-row min/max envelope of a candidate series for LB_Keogh.
+
+    Row i holds the per-feature envelope of the candidate over the
+    warping window a query sample i may align with: the whole candidate
+    for row 0 (the DP always fills its first row) or when the window
+    covers the series, else [i - w, i + w]. The candidate's first
+    sample is folded into every row because the DP always fills the
+    first column. Rows stop at i = N + w - 1; beyond that the window is
+    empty and the envelope degenerates to the first sample, which the
+    evaluation kernel handles without storage.
+    """
+    N, D = ts_c.shape
+    n_rows = 1 if w >= N else N + w
+    # float32 like the series themselves, so the exceedance arithmetic
+    # is bit-identical to scanning the candidate directly
+    env_mn = np.empty((n_rows, D), dtype=np.float32)
+    env_mx = np.empty((n_rows, D), dtype=np.float32)
+    for i in range(n_rows):
+        if i == 0 or w >= N:
+            lo, hi = 0, N
+        else:
+            lo, hi = max(0, i - w), min(N, i + w + 1)
+        for k in range(D):
+            mn = ts_c[0, k]
+            mx = ts_c[0, k]
+            for j in range(lo, hi):
+                v = ts_c[j, k]
+                if v < mn:
+                    mn = v
+                if v > mx:
+                    mx = v
+            env_mn[i, k] = mn
+            env_mx[i, k] = mx
+    return env_mn, env_mx
+
+
+@njit(cache=True, fastmath=_FASTMATH_FLAGS)
+def _lb_keogh_nb(ts_q, ts_c, env_mn, env_mx, w):
+    """LB_Keogh lower bound on the windowed DTW distance above.
+
+    Charges the squared exceedance wherever a query sample falls
+    outside the candidate's envelope for that row. Every warping path
+    aligns each query sample with at least one candidate sample inside
+    the window the envelope covers, so the sum never exceeds the true
+    DTW distance; this also holds for unequal lengths. The envelopes
+    come precomputed from _keogh_envelope_nb, so evaluating the bound
+    is a single pass over the query instead of a window scan per row.
+    """
+    M, N = ts_q.shape[0], ts_c.shape[0]
+    D = ts_q.shape[1]
+    n_rows = env_mn.shape[0]
+    lb = 0.0
+    for i in range(M):
+        for k in range(D):
+            if i < n_rows:
+                mn = env_mn[i, k]
+                mx = env_mx[i, k]
+            elif w >= N:
+                mn = env_mn[0, k]
+                mx = env_mx[0, k]
+            else:
+                mn = ts_c[0, k]
+                mx = ts_c[0, k]
+            q = ts_q[i, k]
+            if q > mx:
+                diff = q - mx
+                lb += diff * diff
+            elif q < mn:
+                diff = mn - q
+                lb += diff * diff
+    return lb
+
 
 class KnnDtw(object):
     """K-nearest neighbor classifier using dynamic time warping
@@ -24,12 +328,26 @@ class KnnDtw(object):
         Step size for the timeseries array. By setting subsample_step = 2,
         the timeseries length will be reduced by 50% because every second
         item is skipped. Implemented by x[:, ::subsample_step]
+
+    n_jobs : int, optional (default = 1)
+        Number of worker processes used to compute the pairwise DTW
+        distance matrix. Each pair is independent, so the speedup is
+        near-linear. -1 uses all cores.
+
+    use_gpu : bool, optional (default = False)
+        Offload _dist_matrix to a CUDA kernel, one thread per pair.
+        Silently falls back to the CPU paths when no CUDA device is
+        available or the series do not fit the kernel (unequal lengths
+        after subsampling, or longer than 256 samples).
     """
-    
-    def __init__(self, n_neighbors=10, max_warping_window=10000, subsample_step=1):
+
+    def __init__(self, n_neighbors=10, max_warping_window=10000, subsample_step=1,
+                 n_jobs=1, use_gpu=False):
         self.n_neighbors = n_neighbors
         self.max_warping_window = max_warping_window
         self.subsample_step = subsample_step
+        self.n_jobs = n_jobs
+        self.use_gpu = use_gpu
     
     def fit(self, x, l):
         """Fit the model using x as training data and l as class labels
@@ -43,10 +361,48 @@ class KnnDtw(object):
             Training labels for input into KNN classifier
         """
         
-        self.x = np.array(x)
+        self.x = _series_list(x)
         self.l = np.array(l)
+        # Integer codes for the labels, so predict can count votes with
+        # bincount; np.unique sorts, so code order is label order
+        self._classes, self._label_codes = np.unique(self.l,
+                                                     return_inverse=True)
+        self._dtw_cache = {}
+        self._x_sub = None
+        self._x_sub_step = None
+        self._x_env = None
+        self._x_env_key = None
+
+    def _train_subsampled(self):
+        """The training series subsampled and coerced for the kernels.
+
+        Computed once per fit and reused across predict calls: the
+        slices are materialized contiguous, so the DP kernels read
+        unit-stride float32 instead of re-slicing every query.
+        Recomputed if subsample_step changed since the last call.
+        """
+        s = self.subsample_step
+        if self._x_sub is None or self._x_sub_step != s:
+            self._x_sub = [_as_series(ts[::s]) for ts in self.x]
+            self._x_sub_step = s
+        return self._x_sub
+
+    def _train_envelopes(self):
+        """LB_Keogh envelopes of the subsampled training series.
+
+        Built once per fit and reused across predict calls, so the
+        bound costs one pass over the query per candidate instead of a
+        window scan per query row. Recomputed if subsample_step or
+        max_warping_window changed since the last call.
+        """
+        key = (self.subsample_step, int(self.max_warping_window))
+        if self._x_env is None or self._x_env_key != key:
+            self._x_env = [_keogh_envelope_nb(ts, key[1])
+                           for ts in self._train_subsampled()]
+            self._x_env_key = key
+        return self._x_env
         
-    def _dtw_distance(self, ts_a, ts_b, d = lambda x,y: np.linalg.norm(x-y)):
+    def _dtw_distance(self, ts_a, ts_b, upper_bound = np.inf):
         """Returns the DTW similarity distance between two 2-D
         timeseries numpy arrays.
 
@@ -55,70 +411,89 @@ class KnnDtw(object):
         ts_a, ts_b : array of shape [n_samples, n_timepoints]
             Two arrays containing n_samples of timeseries data
             whose DTW distance between each sample of A and B
-            will be compared
-        
-        d : DistanceMetric object (default = abs(x-y))
-            the distance measure used for A_i - B_j in the
-            DTW dynamic programming function
-        
+            will be compared. The pointwise cost is the squared
+            Euclidean distance between samples.
+
+        upper_bound : float, optional (default = np.inf)
+            Early-abandoning threshold. When the distance is known to
+            be at least upper_bound the sweep is abandoned and np.inf
+            is returned.
+
         Returns
         -------
         DTW distance between A and B
         """
+        return _dtw_dispatch(_as_series(ts_a), _as_series(ts_b),
+                             int(self.max_warping_window),
+                             float(upper_bound))
 
-        # Create cost matrix via broadcasting with large int
-        ts_a, ts_b = np.array(ts_a), np.array(ts_b)
-        M, N = len(ts_a), len(ts_b)
-        cost = sys.maxint * np.ones((M, N))
+    def _dtw_distance_cached(self, ts_a, ts_b):
+        """Memoizing wrapper around _dtw_distance.
 
-        # Initialize the first row and column
-        cost[0, 0] = d(ts_a[0], ts_b[0])
-        for i in xrange(1, M):
-            cost[i, 0] = cost[i-1, 0] + d(ts_a[i], ts_b[0])
-
-        for j in xrange(1, N):
-            cost[0, j] = cost[0, j-1] + d(ts_a[0], ts_b[j])
-
-        # Populate rest of cost matrix within window
-        for i in xrange(1, M):
-            for j in xrange(max(1, i - self.max_warping_window),
-                            min(N, i + self.max_warping_window)):
-                choices = cost[i - 1, j - 1], cost[i, j-1], cost[i-1, j]
-                cost[i, j] = min(choices) + d(ts_a[i], ts_b[j])
-        
-        # Return DTW distance given window 
-        return cost[-1, -1]
+        The key is the ordered pair of array contents plus the window,
+        so a pair repeated across calls is computed once. The arguments
+        are never swapped: the band predicate -w <= j - i <= w - 1 is
+        not symmetric, so dtw(a, b) and dtw(b, a) differ in general and
+        get separate entries. The cache lives on the fitted model and
+        survives across predict / dtw_matches calls; fit resets it.
+        """
+        cache = getattr(self, '_dtw_cache', None)
+        if cache is None:
+            return self._dtw_distance(ts_a, ts_b)
+
+        a, b = _as_series(ts_a), _as_series(ts_b)
+        key = ((a.shape, a.tobytes()), (b.shape, b.tobytes()),
+               self.max_warping_window)
+        if key not in cache:
+            cache[key] = _dtw_dispatch(a, b, int(self.max_warping_window),
+                                       np.inf)
+        return cache[key]
 
-    def _dtw_match(self, ts_a, ts_b, d = lambda x,y: np.linalg.norm(x-y)):
-        ts_a, ts_b = np.array(ts_a), np.array(ts_b)
+    def _dtw_match(self, ts_a, ts_b):
+        ts_a, ts_b = _as_series(ts_a), _as_series(ts_b)
         M, N = len(ts_a), len(ts_b)
-        cost = sys.maxint * np.ones((M, N))
-        # If the predecessor is on the left, set to be 1; 
+        # Precompute the full pointwise cost matrix in one C-level call,
+        # so the dynamic program below only reads C[i, j] instead of
+        # making M*N interpreted distance calls. Squared Euclidean
+        # matches the convention of the _dtw_distance kernels.
+        C = cdist(ts_a, ts_b, 'sqeuclidean')
+        cost = np.inf * np.ones((M, N))
+        # If the predecessor is on the left, set to be 1;
         # If the predecessor is on the top, set to be -1.
         # If the predecessor is on the top left, set to be 0.
-        predecessor = np.zeros((M, N))
+        # One byte per cell is plenty for three codes and keeps the
+        # backtracking matrix 8x smaller than the float64 default.
+        predecessor = np.zeros((M, N), dtype=np.int8)
 
         # Initialize the first row and column
-        cost[0, 0] = d(ts_a[0], ts_b[0])
-        for i in xrange(1, M):
-            cost[i, 0] = cost[i-1, 0] + d(ts_a[i], ts_b[0])
+        cost[0, 0] = C[0, 0]
+        for i in range(1, M):
+            cost[i, 0] = cost[i-1, 0] + C[i, 0]
             predecessor[i, 0] = -1
 
-        for j in xrange(1, N):
-            cost[0, j] = cost[0, j-1] + d(ts_a[0], ts_b[j])
+        for j in range(1, N):
+            cost[0, j] = cost[0, j-1] + C[0, j]
             predecessor[0, j] = 1
 
-        for i in xrange(1, M):
-            for j in xrange(max(1, i - self.max_warping_window),
-                            min(N, i + self.max_warping_window)):
-                if cost[i-1, j-1] <= cost[i, j-1] and cost[i-1, j-1] <= cost[i-1, j]:
-                    cost[i, j] = cost[i-1, j-1] + d(ts_a[i], ts_b[j])
-                    predecessor[i, j] = 0
-                elif cost[i, j-1] <= cost[i-1, j-1] and cost[i, j-1] <= cost[i-1, j]:
-                    cost[i, j] = cost[i, j-1] + d(ts_a[i], ts_b[j])
+        # Window bounds per row, computed once up front instead of via
+        # attribute lookups and min/max calls inside the sweep
+        w = self.max_warping_window
+        j_lo = np.clip(np.arange(M) - w, 1, None)
+        j_hi = np.clip(np.arange(M) + w, None, N)
+        for i in range(1, M):
+            for j in range(j_lo[i], j_hi[i]):
+                # Plain comparisons; ties resolve in (top left, left,
+                # top) order like the original chain
+                c_diag = cost[i-1, j-1]
+                c_left = cost[i, j-1]
+                c_top = cost[i-1, j]
+                if c_diag <= c_left and c_diag <= c_top:
+                    cost[i, j] = c_diag + C[i, j]
+                elif c_left <= c_top:
+                    cost[i, j] = c_left + C[i, j]
                     predecessor[i, j] = 1
                 else:
-                    cost[i, j] = cost[i-1, j] + d(ts_a[i], ts_b[j])
+                    cost[i, j] = c_top + C[i, j]
                     predecessor[i, j] = -1
 
         x = M - 1
@@ -136,91 +511,185 @@ class KnnDtw(object):
         result = [(0, 0)] + result
         return result
     
-    def _dist_matrix(self, x, y):
+    def _dist_matrix(self, x, y, symmetric=False):
         """Computes the M x N distance matrix between the training
         dataset and testing dataset (y) using the DTW distance measure
-        
+
         Arguments
         ---------
         x : array of shape [n_samples, n_timepoints]
-        
+
         y : array of shape [n_samples, n_timepoints]
-        
+
+        symmetric : bool, optional (default = False)
+            Declare that x and y are the same dataset, so only the
+            upper triangle of pairs is computed. Passing the same
+            object for both is detected automatically; equal-content
+            copies take the rectangular path unless flagged.
+
         Returns
         -------
         Distance matrix between each item of x and y with
             shape [training_n_samples, testing_n_samples]
         """
         # Convert to numpy array
-        x = np.array(x); y = np.array(y)
-        # Compute the distance matrix        
-        dm_count = 0
-        
+        same = symmetric or x is y
+        x = _series_list(x); y = _series_list(y)
+        s = self.subsample_step
+
+        if self.use_gpu:
+            dm = self._dist_matrix_gpu(x, x if same else y)
+            if dm is not None:
+                return dm
+
+        parallel = Parallel(n_jobs=self.n_jobs, backend='loky')
+
         # Compute condensed distance matrix (upper triangle) of pairwise dtw distances
-        # when x and y are the same array
-        if(np.array_equal(x, y)):
-            x_s = x.shape
-            dm = np.zeros((x_s[0] * (x_s[0] - 1)) // 2, dtype=np.double)
-            
-            for i in xrange(0, x_s[0] - 1):
-                for j in xrange(i + 1, x_s[0]):
-                    dm[dm_count] = self._dtw_distance(x[i][::self.subsample_step],
-                                                      y[j][::self.subsample_step])
-            
+        # when x and y are the same array; every pair is independent
+        if same:
+            n = len(x)
+            subs = [_as_series(x[i][::s]) for i in range(n)]
+
+            # Equal-length series stack into one array the prange kernel
+            # can chew through with threads; ragged sets fall back to the
+            # worker pool
+            if len(set(a.shape for a in subs)) == 1 and n > 1:
+                xs = np.stack(subs)
+                idx_i, idx_j = np.triu_indices(n, 1)
+                dm = _dtw_pairs_nb(xs, idx_i, idx_j,
+                                   int(self.max_warping_window))
+            else:
+                dm = np.asarray(parallel(
+                    delayed(self._dtw_distance_cached)(subs[i], subs[j])
+                    for i, j in itertools.combinations(range(n), 2)),
+                    dtype=np.double)
+
             # Convert to squareform
             dm = squareform(dm)
             return dm
-        
+
         # Compute full distance matrix of dtw distnces between x and y
         else:
-            x_s = x.shape
-            y_s = y.shape
-            dm = np.zeros((x_s[0], y_s[0])) 
-            dm_size = x_s[0]*y_s[0]
-        
-            for i in xrange(0, x_s[0]):
-                print "i", i
-                for j in xrange(0, y_s[0]):
-                    dm[i, j] = self._dtw_distance(x[i][::self.subsample_step],
-                                                  y[j][::self.subsample_step])
-        
-            return dm
+            n_x = len(x)
+            n_y = len(y)
+            # Slice and coerce each series once instead of n_x * n_y
+            # times inside the pair loop
+            xs = [_as_series(x[i][::s]) for i in range(n_x)]
+            ys = [_as_series(y[j][::s]) for j in range(n_y)]
+            dm = parallel(delayed(self._dtw_distance_cached)(xs[i], ys[j])
+                          for i, j in itertools.product(range(n_x), range(n_y)))
+
+            return np.asarray(dm, dtype=np.double).reshape(n_x, n_y)
         
+    def _knn_row(self, ts_q, train, envs, k):
+        """DTW distances from one test series to the training set,
+        pruned with the LB_Keogh lower bound.
+
+        Candidates are visited in order of increasing lower bound while
+        a running upper bound (the k-th best distance so far) feeds the
+        kernel's early abandoning; once a lower bound reaches the upper
+        bound all remaining candidates are skipped. Pruned entries stay
+        at inf, which is safe because they cannot be among the k
+        nearest, so the returned row still sorts correctly.
+        """
+        w = int(self.max_warping_window)
+        q = _as_series(ts_q)
+        n = len(train)
+        row = np.full(n, np.inf)
+        lbs = np.empty(n)
+        for j in range(n):
+            env_mn, env_mx = envs[j]
+            lbs[j] = _lb_keogh_nb(q, train[j], env_mn, env_mx, w)
+
+        heap = []  # max-heap (negated) of the k best distances so far
+        ub = np.inf
+        for j in np.argsort(lbs):
+            if len(heap) == k and lbs[j] >= ub:
+                break
+            dist = _dtw_dispatch(q, train[j], w, ub)
+            row[j] = dist
+            if len(heap) < k:
+                heapq.heappush(heap, -dist)
+                if len(heap) == k:
+                    ub = -heap[0]
+            elif dist < ub:
+                heapq.heapreplace(heap, -dist)
+                ub = -heap[0]
+        return row
+
+    def _dist_matrix_gpu(self, x, y):
+        """Distance matrix computed on the GPU, or None when the CUDA
+        kernel does not apply: no device, ragged lengths after
+        subsampling, or series longer than _CUDA_MAX_LEN."""
+        try:
+            if not cuda.is_available():
+                return None
+        except Exception:
+            return None
+
+        s = self.subsample_step
+        xs = [_as_series(ts[::s]) for ts in x]
+        ys = xs if y is x else [_as_series(ts[::s]) for ts in y]
+        if len(set(a.shape for a in xs)) != 1 or \
+                len(set(b.shape for b in ys)) != 1:
+            return None
+        if xs[0].shape[1] != ys[0].shape[1]:
+            return None
+        if max(xs[0].shape[0], ys[0].shape[0]) > _CUDA_MAX_LEN:
+            return None
+
+        xa = cuda.to_device(np.stack(xs))
+        xb = xa if ys is xs else cuda.to_device(np.stack(ys))
+        out = cuda.device_array((len(xs), len(ys)))
+        n_pairs = len(xs) * len(ys)
+        threads = 64
+        blocks = (n_pairs + threads - 1) // threads
+        _dtw_pairs_cuda[blocks, threads](xa, xb,
+                                         int(self.max_warping_window), out)
+        return out.copy_to_host()
+
     def predict(self, y):
-        """Predict the class labels or probability estimates for 
+        """Predict the class labels or probability estimates for
         the provided data
 
         Arguments
         ---------
           y : array of shape [n_samples, n_timepoints]
               Array containing the testing data set to be classified
-          
+
         Returns
         -------
           2 arrays representing:
-              (1) the predicted class labels 
+              (1) the predicted class labels
               (2) the knn label count probability
         """
-        y = np.array(y)
-        dm = self._dist_matrix(y, self.x)
-        n_col = dm.shape[1]
-        k = min(n_col, self.n_neighbors)
+        y = _series_list(y)
+        s = self.subsample_step
+        train = self._train_subsampled()
+        envs = self._train_envelopes()
+        k = min(len(train), self.n_neighbors)
+        parallel = Parallel(n_jobs=self.n_jobs, backend='loky')
+        dm = np.array(parallel(delayed(self._knn_row)(y[i][::s], train, envs, k)
+                               for i in range(len(y))))
+        # Identify the k nearest neighbors; argpartition selects them in
+        # O(n) per row and the vote count below doesn't need them sorted
+        knn_idx = np.argpartition(dm, k - 1, axis=1)[:, :k]
 
-        # Identify the k nearest neighbors
-        knn_idx = dm.argsort()[:, :k]
+        # Identify k nearest labels and count votes per class
+        knn_codes = self._label_codes[knn_idx]
+        counts = np.vstack([np.bincount(row, minlength=len(self._classes))
+                            for row in knn_codes])
 
-        # Identify k nearest labels
-        knn_labels = self.l[knn_idx]
-        
-        # Model Label
-        mode_data = mode(knn_labels, axis=1)
-        mode_label = mode_data[0]
-        mode_proba = mode_data[1]/self.n_neighbors
+        # Model Label; ties go to the smallest class code, matching the
+        # smallest-modal-value rule of scipy.stats.mode
+        mode_code = counts.argmax(axis=1)
+        mode_label = self._classes[mode_code]
+        mode_proba = counts[np.arange(len(counts)), mode_code]/self.n_neighbors
 
-        return mode_label.ravel(), mode_proba.ravel()
+        return mode_label, mode_proba
 
     def dtw_matches(self, y):
-        y = np.array(y)
+        y = _series_list(y)
         dm = self._dist_matrix(y, self.x)
         
         neighbor_indices = np.argmin(dm, axis = 1)
@@ -7,7 +7,8 @@ sample_rate = 10
 # load data
 N_users = 10
 for i in range(N_users):
-    execfile("data/user" + str(i + 1) + ".py")
+    with open("data/user" + str(i + 1) + ".py") as f:
+        exec(f.read())
 all_data = [data_user1, data_user2, data_user3, data_user4, data_user5, \
         data_user6, data_user7, data_user8, data_user9, data_user10]
 
@@ -17,7 +18,7 @@ filter_and_getExemplaries(all_data, sample_rate)
 # make prediction
 recognizer = Recognizer(sample_rate)
 # The data is from letter "O"
-print recognizer.predict_one([[ 0.00151,  0.01135],
+print(recognizer.predict_one([[ 0.00151,  0.01135],
        [ 0.01175,  0.02839], 
        [ 0.0243 , -0.00781],
        [ 0.01606, -0.03011],
@@ -253,4 +254,4 @@ print recognizer.predict_one([[ 0.00151,  0.01135],
        [-0.09506,  0.06398],
        [-0.09172,  0.06462],
        [-0.11448,  0.06308],
-       [-0.12922,  0.07414]])
\ No newline at end of file
+       [-0.12922,  0.07414]]))
\ No newline at end of file
@@ -7,7 +7,7 @@ def preprocess(d, sample_rate):
 	if l < sample_rate:
 		d = np.mean(d, axis = 0).reshape(-1, 2)
 	else:
-		new_l = (l / sample_rate) * sample_rate
+		new_l = (l // sample_rate) * sample_rate
 		remaining_d = d[new_l:, :]
 		d = d[:new_l, :]
 		d = np.mean(d.reshape(-1,sample_rate,2), axis = 1)
@@ -0,0 +1,21 @@
+"""Builds the optional C extension for the DTW dynamic program:
+
+    python setup.py build_ext --inplace
+
+knn_dtw_class uses the extension when it is importable and falls back
+to its Numba kernel otherwise.
+"""
+import numpy as np
+from setuptools import Extension, setup
+
+setup(
+    name='AirGestureClassifier',
+    version='0.1',
+    py_modules=['knn_dtw_class', 'preprocess', 'Recognizer',
+                'exemplary_points'],
+    ext_modules=[
+        Extension('_dtw_ext', sources=['_dtw_ext.c'],
+                  include_dirs=[np.get_include()],
+                  extra_compile_args=['-O3']),
+    ],
+)